@@ -1,10 +1,17 @@
 import tkinter as tk
+from tkinter import ttk
 from os.path import isdir
+import time
+import threading
 import jsonhandler
 
 class Gui(tk.Tk):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, useDatabase=False, reportMissing=False, **kwargs):
+        # Taken before Tk starts, so its startup counts towards first paint
+        startTime = time.perf_counter()
         tk.Tk.__init__(self, *args, **kwargs)
+        self.createState(startTime, useDatabase)
+        self.reportMissing = reportMissing
 
         # A big container for the main frame
         self.container = tk.Frame(self)
@@ -12,13 +19,49 @@ class Gui(tk.Tk):
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
-        self.checkGameDirectory()
-
         self.createSidebar()
-        self.mainloop()
+        self.showFrame("MainFrame")
+        self.bind("<Expose>", self.onExpose, add="+")
+
+        # JSON is loaded once the window is up, so it does not delay it
+        self.after(0, self.checkGameDirectory)
+
+    # Everything Gui keeps track of that does not involve Tk
+    def createState(self, startTime, useDatabase):
+        self.startTime = startTime
+        self.useDatabase = useDatabase
+        self.dataLoaded = False
+
+        # Startup timings, in seconds; None until the event happens
+        self.firstPaintTime = None
+        self.loadTime = None
+        self.firstSearchTime = None
+
+        # Set by the loading thread
+        self.loadingThread = None
+        self.loadingError = None
+
+        # Frames are only built the first time they are shown
+        self.frames = {}
+        self.frameClasses = {}
+        for Frame in (MainFrame, ItemFrame, MutationFrame, BionicFrame, MartialArtFrame, MonsterFrame, CraftingFrame, VehicleFrame, TableFrame):
+            self.frameClasses[Frame.__name__] = Frame
+
+        # Shared by every lookup frame
+        self.searcher = None
+        self.translator = None
+
+    # The first Expose event is when the window actually gets drawn
+    def onExpose(self, _):
+        if self.firstPaintTime is None:
+            self.firstPaintTime = time.perf_counter() - self.startTime
+            print(f"Window shown after {self.firstPaintTime:.2f}s")
+
+    def createLoader(self):
+        return jsonhandler.JsonLoader(self.useDatabase, self.reportMissing)
 
     def checkGameDirectory(self):
-        self.jsonLoader = jsonhandler.JsonLoader()
+        self.jsonLoader = self.createLoader()
         directory = self.jsonLoader.readJsonDir()
         if not directory:
             self.createDirectoryFrame()
@@ -33,33 +76,87 @@ class Gui(tk.Tk):
         frameInstance.grid(row=0, column=0, sticky="nsew")
         frameInstance.tkraise()
 
+    # Loads JSON in a background thread so the window stays responsive.
+    # The thread never touches Tk; checkLoading picks the result up on the
+    # main loop
     def createScreens(self, directory):
-        self.loadedJson = self.jsonLoader.getJson()
+        self.showFrame("MainFrame")
+        self.frames["MainFrame"].setStatus("Loading JSON...")
+        self.loadingThread = threading.Thread(target=self.loadJson, daemon=True)
+        self.loadingThread.start()
+        self.checkLoading()
+
+    def loadJson(self):
+        try:
+            self.jsonLoader.getJson()
+        except Exception as error:
+            self.loadingError = error
+
+    def checkLoading(self):
+        if self.loadingThread.is_alive():
+            self.after(50, self.checkLoading)
+            return
+        if self.loadingError:
+            self.frames["MainFrame"].setStatus("Failed to load JSON.")
+            raise self.loadingError
+        self.useLoadedJson()
+
+    def useLoadedJson(self):
+        self.loadedJson = self.jsonLoader.items
         self.organizedJson = self.jsonLoader.getOrganizedJson()
-        self.createMainFrame()
+        self.columns = self.jsonLoader.getColumns()
+        self.links = self.jsonLoader.getLinks()
+        self.dataLoaded = True
+        self.loadTime = time.perf_counter() - self.startTime
+        print(f"JSON loaded after {self.loadTime:.2f}s")
+
+        self.frames["MainFrame"].setStatus("")
+        self.showFrame("MainFrame")
 
     def createSidebar(self):
         self.sidebar = Sidebar(controller=self)
         self.sidebar.pack(side="left", fill="both")
 
-    def createMainFrame(self):
-        self.frames = {}
-        for Frame in (MainFrame, ItemFrame, MutationFrame, BionicFrame, MartialArtFrame, MonsterFrame, CraftingFrame, VehicleFrame):
-            frameName = Frame.__name__
-            frameInstance = Frame(parent=self.container, controller=self)
-            self.frames[frameName] = frameInstance
-
-            # put all of the pages in the same location;
-            # the one on the top of the stacking order
-            # will be the one that is visible.
-            frameInstance.grid(row=0, column=0, sticky="nsew")
-        self.showFrame("MainFrame")
+    def createFrame(self, frameName):
+        frameInstance = self.frameClasses[frameName](parent=self.container, controller=self)
+        self.frames[frameName] = frameInstance
+
+        # put all of the pages in the same location;
+        # the one on the top of the stacking order
+        # will be the one that is visible.
+        frameInstance.grid(row=0, column=0, sticky="nsew")
+        return frameInstance
 
     # Moves specified frame to the top, making it replace current one
     def showFrame(self, frameName):
-        frame = self.frames[frameName]
+        frame = self.frames.get(frameName)
+        if not frame:
+            # Everything except the main frame needs the JSON to be loaded
+            if frameName != "MainFrame" and not self.dataLoaded:
+                return
+            frame = self.createFrame(frameName)
         frame.tkraise()
 
+    def getSearcher(self):
+        if not self.searcher:
+            self.searcher = jsonhandler.JsonSearcher(
+                self.loadedJson,
+                self.organizedJson,
+                self.jsonLoader
+            )
+        return self.searcher
+
+    def getTranslator(self):
+        if not self.translator:
+            self.translator = jsonhandler.JsonTranslator()
+        return self.translator
+
+    # duration is from pressing the search button to the result being shown
+    def reportSearch(self, duration):
+        if self.firstSearchTime is None:
+            self.firstSearchTime = duration
+            print(f"First search took {duration:.2f}s")
+
 class Sidebar(tk.Frame):
     def __init__(self, controller):
         tk.Frame.__init__(self)
@@ -126,6 +223,14 @@ class Sidebar(tk.Frame):
         )
         craftingButton.pack(side="top")
 
+        tableButton = tk.Button(
+            self,
+            text="Tables",
+            width = bWidth,
+            command = lambda: self.controller.showFrame("TableFrame")
+        )
+        tableButton.pack(side="top")
+
         exitButton = tk.Button(
             self,
             text="Exit",
@@ -164,10 +269,147 @@ class MainFrame(tk.Frame):
         welcome = tk.Label(self, text="Welcome to Dellon's JSON browser!")
         welcome.pack()
 
+        self.status = tk.Label(self)
+        self.status.pack()
+
+    def setStatus(self, message):
+        self.status["text"] = message
+
+# Sortable comparison table over the numeric columns parsed at load time
+class TableFrame(tk.Frame):
+    def __init__(self, parent, controller):
+        tk.Frame.__init__(self, parent)
+
+        self.columns = controller.columns
+        self.currentTableType = self.columns.getTypes()[0]
+        self.sortColumn = None
+        self.sortReverse = False
+
+        self.createUI()
+        self.showTable(self.currentTableType)
+
+    def createUI(self):
+        self.label = tk.Label(self, text="Welcome to the comparison tables")
+        self.label.pack(side="top")
+
+        self.tableType = tk.StringVar(self, self.currentTableType)
+        typeMenu = tk.OptionMenu(self, self.tableType, *self.columns.getTypes(), command=self.showTable)
+        typeMenu.pack()
+
+        filterBar = tk.Frame(self)
+        filterBar.pack()
+
+        self.filterColumn = tk.StringVar(self)
+        self.filterMenu = tk.OptionMenu(filterBar, self.filterColumn, "")
+        self.filterMenu.pack(side="left")
+
+        tk.Label(filterBar, text="from").pack(side="left")
+        self.minimumField = tk.Entry(filterBar, width=8)
+        self.minimumField.pack(side="left")
+
+        tk.Label(filterBar, text="to").pack(side="left")
+        self.maximumField = tk.Entry(filterBar, width=8)
+        self.maximumField.pack(side="left")
+
+        filterButton = tk.Button(filterBar, text="Filter", command=self.refreshTable)
+        filterButton.pack(side="left")
+
+        self.table = ttk.Treeview(self, show="headings", height=20)
+        self.table.pack(fill="both", expand=True)
+
+        self.statsField = tk.Label(self, justify="left")
+        self.statsField.pack(side="bottom")
+
+    def showTable(self, tableType):
+        self.currentTableType = tableType
+        self.sortColumn = None
+        self.sortReverse = False
+        self.minimumField.delete(0, "end")
+        self.maximumField.delete(0, "end")
+
+        columnNames = self.columns.getColumnNames(tableType)
+        self.table["columns"] = ["name"] + columnNames
+        self.table.heading("name", text="name")
+        for column in columnNames:
+            # Default argument pins the column name, otherwise every heading sorts the last column
+            self.table.heading(column, text=column, command=lambda c=column: self.sortBy(c))
+            self.table.column(column, width=90, anchor="e")
+
+        self.resetFilterMenu(columnNames)
+        self.refreshTable()
+
+    def resetFilterMenu(self, columnNames):
+        menu = self.filterMenu["menu"]
+        menu.delete(0, "end")
+        for column in columnNames:
+            menu.add_command(label=column, command=lambda c=column: self.filterColumn.set(c))
+        self.filterColumn.set(columnNames[0])
+
+    def sortBy(self, column):
+        # Clicking the same heading twice flips the order
+        if self.sortColumn == column:
+            self.sortReverse = not self.sortReverse
+        else:
+            self.sortColumn = column
+            self.sortReverse = False
+        self.refreshTable()
+
+    def readBound(self, field):
+        try:
+            return float(field.get())
+        except ValueError:
+            return None
+
+    def getVisibleIndices(self):
+        minimum = self.readBound(self.minimumField)
+        maximum = self.readBound(self.maximumField)
+
+        if minimum is None and maximum is None:
+            indices = None
+        else:
+            indices = self.columns.filterRange(self.currentTableType, self.filterColumn.get(), minimum, maximum)
+
+        if self.sortColumn:
+            return self.columns.sortIndices(self.currentTableType, self.sortColumn, indices, self.sortReverse)
+        elif indices is None:
+            return self.columns.getAllIndices(self.currentTableType)
+        return indices
+
+    def refreshTable(self):
+        tableType = self.currentTableType
+        indices = self.getVisibleIndices()
+        names = self.columns.getNames(tableType)
+        columnValues = [self.columns.getColumn(tableType, c) for c in self.columns.getColumnNames(tableType)]
+
+        self.table.delete(*self.table.get_children())
+        for i in indices:
+            row = [names[i]] + [self.formatValue(values[i]) for values in columnValues]
+            self.table.insert("", "end", values=row)
+
+        self.showStats(indices)
+
+    def showStats(self, indices):
+        column = self.sortColumn or self.filterColumn.get()
+        stats = self.columns.aggregate(self.currentTableType, column, indices)
+        self.statsField["text"] = (
+            f"{len(indices)} rows; {column}: "
+            f"min {self.formatValue(stats['min'])}, "
+            f"max {self.formatValue(stats['max'])}, "
+            f"mean {self.formatValue(stats['mean'])}"
+        )
+
+    def formatValue(self, value):
+        if value is None:
+            return ""
+        elif float(value).is_integer():
+            return str(int(value))
+        return f"{value:.2f}"
+
 class LookupFrame(tk.Frame):
     def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent)
 
+        self.controller = controller
         self.setLookupType()
         self.createJsonSearcher(controller)
         self.createUI()
@@ -177,8 +419,9 @@ class LookupFrame(tk.Frame):
         self.currentLookupType = lookupType
 
     def createJsonSearcher(self, controller):
-        self.searcher = jsonhandler.JsonSearcher(controller.loadedJson, controller.organizedJson)
-        self.translator = jsonhandler.JsonTranslator()
+        self.searcher = controller.getSearcher()
+        self.translator = controller.getTranslator()
+        self.links = controller.links
 
     def createUI(self):
         self.label = tk.Label(self, text=self.getWelcomeMessage())
@@ -192,9 +435,14 @@ class LookupFrame(tk.Frame):
         self.resultField.configure(state="disabled")
         self.resultField.pack()
 
-        searchButton = tk.Button(self, text="Search", command=self.searchItem)
+        searchButton = tk.Button(self, text="Search", command=self.runSearch)
         searchButton.pack()
 
+    def runSearch(self):
+        startTime = time.perf_counter()
+        self.searchItem()
+        self.controller.reportSearch(time.perf_counter() - startTime)
+
     def addLine(self, message):
         # Disabling/enabling field is done to prevent typing in Text box
         self.resultField.configure(state="normal")
@@ -242,6 +490,9 @@ class LookupFrame(tk.Frame):
             result = self.searcher.searchByAttribute(attributes, self.currentLookupType)
         else:
             result = self.searcher.searchByAttribute({"name": search}, self.currentLookupType)
+            # Nothing has a similar name, so look for it in descriptions too
+            if not result:
+                result = self.searcher.searchByText(search, self.currentLookupType)
         return result
 
     def outputResult(self, result):
@@ -262,9 +513,6 @@ class LookupFrame(tk.Frame):
 
         entry[attributeName] = "\n".join(output)
 
-    def getEntryByID(self, entryID, entryType):
-        return self.searcher.organizedJson[entryType].get(entryID)
-
     def getWelcomeMessage(self):
         pass
 
@@ -300,24 +548,17 @@ class MutationFrame(LookupFrame):
             self.prettify(rawJson, prettifier, prettifiers[prettifier])
 
     def prettifyMutationPath(self, mutationPath, output):
-        pathJson = self.getEntryByID(mutationPath, "mutation_category")
-        name = pathJson["name"]
-        output.append(name)
+        output.append(self.links.getName(mutationPath, "mutation_category"))
 
     def prettifyMutationList(self, mutation, output):
-        mutationJson = self.getEntryByID(mutation, "mutation")
-        name = mutationJson["name"]
-        output.append(name)
+        output.append(self.links.getName(mutation, "mutation"))
 
     def prettifyBodyPartList(self, part, output):
-        partJson = self.getEntryByID(part["part"], "body_part")
-        name = partJson["name"]
-        output.append(part["ignored"] + " on " + name)
+        name = self.links.getName(part["part"], "body_part")
+        output.append(f"{part['ignored']} on {name}")
 
     def prettifyMartialArtsList(self, art, output):
-        artJson = self.getEntryByID(art, "martial_art")
-        name = artJson["name"]
-        output.append(name)
+        output.append(self.links.getName(art, "martial_art"))
 
 class BionicFrame(LookupFrame):
     def getWelcomeMessage(self):
@@ -389,7 +630,7 @@ class CraftingFrame(LookupFrame):
                 first = False
             else:
                 outputStr += " or "
-            name = self.getNameFromID(optionalTool[0], "item")
+            name = self.getOptionName(optionalTool)
             outputStr += name + f" ({optionalTool[1]} charges)"
         output.append(outputStr)
 
@@ -408,7 +649,7 @@ class CraftingFrame(LookupFrame):
                 first = False
             else:
                 outputStr += " or "
-            name = self.getNameFromID(optionalComponent[0], "item")
+            name = self.getOptionName(optionalComponent)
             outputStr += str(optionalComponent[1]) + " of " + name
         output.append(outputStr)
 
@@ -428,72 +669,47 @@ class CraftingFrame(LookupFrame):
         outputStr = f"{self.getNameFromID(skill[0], 'skill')} (level {skill[1]})"
         output.append(outputStr)
 
+    # Merges the requirement presets in "using" into the recipe and expands
+    # nested requirement lists, all from what the link pass resolved
     def unpackUsing(self, entry):
-        output = []
-        using = entry.get("using")
+        for attribute in ("tools", "components"):
+            if entry.get(attribute):
+                entry[attribute] = self.links.expandAlternatives(entry[attribute], attribute)
 
-        if not using:
+        using = entry.get("using")
+        if not isinstance(using, list):
             return
 
         for preset in using:
+            if not isinstance(preset, list) or len(preset) < 2:
+                continue
             presetID = preset[0]
             presetQuantity = preset[1]
-            presetJson = self.getEntryByID(presetID, "requirement")
-            if not presetJson:
-                return
-            tools = presetJson.get("tools")
-            components = presetJson.get("components")
-            qualities = presetJson.get("qualities")
-
-            #TODO: Refactor
-
-        if tools:
-            self.addToJson(entry, "tools", tools)
-
-        if components:
-            for component in components:
-                for optionalComponent in component:
-                    optionalComponent[1] *= presetQuantity
-            self.addToJson(entry, "components", self.handleRequirementComponent(components))
-
-        if qualities:
-            self.addToJson(entry, "qualities", qualities)
-        return output
-
-    # These are sometimes nested and have to be handled specially.
-    def handleRequirementComponent(self, components):
-        output = []
-
-        for optionalComponents in components:
-            optOutput = []
-            for optionalComponent in optionalComponents:
-                # Nested components appear to have an extra element
-                # to indicate they are nested
-                if len(optionalComponent) > 2:
-                    componentJson = self.getEntryByID(optionalComponent[0], "requirement")
-
-                    buff = self.handleRequirementComponent(componentJson["components"])
-                    quantity = optionalComponent[1]
-                    for comp in buff:
-                        for optComp in comp:
-                            # Multiplies everything by quantity in preset
-                            optComp[1] *= quantity
-                            optOutput.append(optComp)
-                else:
-                    optOutput.append(optionalComponent)
-            output.append(optOutput)
-        return output
+            requirement = self.links.getRequirement(presetID)
+            # Missing presets are already in the link pass report
+            if not requirement:
+                continue
+
+            if requirement["tools"]:
+                self.addToJson(entry, "tools", requirement["tools"])
+            if requirement["components"]:
+                components = self.links.expandAlternatives(requirement["components"], "components", presetQuantity)
+                self.addToJson(entry, "components", components)
+            if requirement["qualities"]:
+                self.addToJson(entry, "qualities", requirement["qualities"])
 
     def addToJson(self, entry, attribute, content):
+        # Lists are not extended in place, since they may belong to the loaded JSON
         if entry.get(attribute):
-            entry[attribute] += content
+            entry[attribute] = entry[attribute] + content
         else:
             entry[attribute] = content
 
+    # Outputs id if name is not found for some reason
     def getNameFromID(self, entryID, entryType):
-        componentJson = self.getEntryByID(entryID, entryType)
-        if componentJson:
-            return componentJson["name"]
-        else:
-            # Output id if name is not found for some reason
-            return entryID
+        return self.links.getName(entryID, entryType)
+
+    # Tools and components are items, unless they are a nested requirement
+    # the link pass could not resolve
+    def getOptionName(self, option):
+        return self.getNameFromID(option[0], jsonhandler.getOptionType(option, "item"))
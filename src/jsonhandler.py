@@ -1,20 +1,73 @@
 import json
 import re
-import glob
 import os
+import time
+import sys
+import sqlite3
+import hashlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import textdistance
 
+# A JSON file found while enumerating, along with the stat info that was
+# read at the same time, so nothing later has to stat it again
+JsonFile = namedtuple("JsonFile", ["path", "mtime", "size"])
+
 class JsonSearcher():
-    def __init__(self, rawJson, organizedJson):
+    # If loader is given, the searcher follows its reloads: when its data
+    # version changes, the new JSON is picked up and cached results are dropped
+    def __init__(self, rawJson, organizedJson, loader=None):
         self.rawJson = rawJson
         self.organizedJson = organizedJson
+        self.loader = loader
+        self.dataVersion = loader.getDataVersion() if loader else 0
+        self.cache = ResultCache()
+
+    def checkDataVersion(self):
+        if self.loader and self.loader.getDataVersion() != self.dataVersion:
+            self.rawJson = self.loader.items
+            self.organizedJson = self.loader.getOrganizedJson()
+            self.dataVersion = self.loader.getDataVersion()
+        self.cache.checkVersion(self.dataVersion)
 
     #TODO Add so user can search for any item with an attribute, without specifying attribute value.
     def searchByAttribute(self, requiredAttributes, jsonType):
+        self.checkDataVersion()
+        key = self.getCacheKey(requiredAttributes, jsonType)
+
+        found, result = self.cache.get(key)
+        if not found:
+            result = self.findByAttribute(requiredAttributes, jsonType)
+            self.cache.put(key, result)
+        return result
+
+    # The same attributes in a different order are the same query
+    def getCacheKey(self, requiredAttributes, jsonType):
+        return jsonType, json.dumps(requiredAttributes, sort_keys=True, default=str)
+
+    def getCacheStats(self):
+        return self.cache.getStats()
+
+    # Does the actual search, without looking at the cache
+    def findByAttribute(self, requiredAttributes, jsonType):
         similarities = []
         # attributes = self.getAttributesFromString(string)
         typeJson = self.rawJson[jsonType]
 
+        # Searching for an id ("id:rock") is a direct lookup
+        if list(requiredAttributes) == ["id"]:
+            entry = self.getEntryByID(requiredAttributes["id"], jsonType)
+            # Skills keep their id in "ident", which an id search never matched
+            if entry and entry.get("id") == requiredAttributes["id"]:
+                return entry
+
+        # The database backend can find exact matches through its indexes,
+        # which saves decoding every entry when the user typed a full name
+        if typeJson.canFindExact(requiredAttributes):
+            entry = typeJson.findExact(requiredAttributes)
+            if entry:
+                return entry
+
         for entry in typeJson:
             if self.containsAllAttributes(entry, requiredAttributes):
                 attributeSimilarity = self.checkAttributeSimilarity(entry, requiredAttributes)
@@ -29,6 +82,29 @@ class JsonSearcher():
 
         return results
 
+    # Returns the entry with that id; the database backend serves repeated
+    # lookups from its cache of recently fetched entries
+    def getEntryByID(self, entryID, jsonType):
+        self.checkDataVersion()
+        return self.organizedJson[jsonType].get(entryID)
+
+    # Returns names of entries mentioning every word of query in their
+    # name or description
+    def searchByText(self, query, jsonType):
+        self.checkDataVersion()
+        words = query.lower().split()
+        # Without any words there is nothing to look for
+        if not words:
+            return []
+
+        key = (jsonType, "text", " ".join(words))
+        found, result = self.cache.get(key)
+        if not found:
+            entries = self.rawJson[jsonType].searchText(words)
+            result = [entry["name"] for entry in entries if entry.get("name")]
+            self.cache.put(key, result)
+        return result
+
     def sortBySimilarity(self, similarities):
         results = []
 
@@ -92,15 +168,127 @@ class JsonSearcher():
 
         return attributes
 
+# LRU cache bounded by entry count and, if maxBytes is given, by the
+# approximate memory the cached values take up. Used for search results
+# and for entries fetched from the database
+class ResultCache():
+    def __init__(self, maxEntries=256, maxBytes=8 * 1024 * 1024):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        # key -> (result, approximate size)
+        self.entries = OrderedDict()
+        self.totalBytes = 0
+        self.version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Empties the cache if the data it was filled from has changed
+    def checkVersion(self, version):
+        if version == self.version:
+            return
+        if self.entries:
+            self.invalidations += 1
+        self.clear()
+        self.version = version
+
+    def clear(self):
+        self.entries.clear()
+        self.totalBytes = 0
+
+    # Returns (found, result), since None is not a cacheable result otherwise
+    def get(self, key):
+        cached = self.entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return True, cached[0]
+
+    def put(self, key, result):
+        size = self.getApproximateSize(result) if self.maxBytes else 0
+        # Results that would push out everything else are not worth keeping
+        if self.maxBytes and size > self.maxBytes:
+            return
+
+        if key in self.entries:
+            self.totalBytes -= self.entries.pop(key)[1]
+        self.entries[key] = (result, size)
+        self.totalBytes += size
+
+        while len(self.entries) > self.maxEntries or (self.maxBytes and self.totalBytes > self.maxBytes):
+            _, (_, evictedSize) = self.entries.popitem(last=False)
+            self.totalBytes -= evictedSize
+            self.evictions += 1
+
+    # Results are either a list of names or a single JSON entry
+    def getApproximateSize(self, result):
+        if isinstance(result, list):
+            return sys.getsizeof(result) + sum(sys.getsizeof(name) for name in result)
+        if isinstance(result, dict):
+            return sys.getsizeof(result) + len(json.dumps(result, default=str))
+        return sys.getsizeof(result)
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self.entries),
+            "bytes": self.totalBytes
+        }
+
 class JsonLoader():
+    def __init__(self, useDatabase=False, reportMissing=False):
+        # With the database backend, entries live in SQLite instead of memory
+        self.useDatabase = useDatabase
+        # Print every reference to a missing entry, not just how many there are
+        self.reportMissing = reportMissing
+        # Bumped on every (re)load, so caches built on old data can tell
+        self.dataVersion = 0
+
+    # Folders that never contain game data. They are skipped so that pointing
+    # the browser at the game root does not walk sounds, graphics and saves
+    ignoredDirectories = {
+        "sound", "gfx", "tilesets", "font", "lang", "doc", "save", "config",
+        "memorial", "graveyard", "templates", "screenshots", "raw", "help", "motd"
+    }
+
+    # Directories scanned at the same time; helps on slow or network disks
+    scanWorkers = 8
+
     def getJson(self):
+        startTime = time.perf_counter()
         jsonFiles = self.getJsonFiles()
-        self.loadJson(jsonFiles)
+        print(f"Found {len(jsonFiles)} JSON files in {time.perf_counter() - startTime:.2f}s")
+
+        startTime = time.perf_counter()
+        if self.useDatabase:
+            self.loadDatabase(jsonFiles)
+        else:
+            self.loadJson(jsonFiles)
+        print(f"Loaded JSON in {time.perf_counter() - startTime:.2f}s")
         return self.items
 
     def getOrganizedJson(self):
         return self.itemsByID
 
+    def getColumns(self):
+        return self.columns
+
+    def getLinks(self):
+        return self.links
+
+    def getDataVersion(self):
+        return self.dataVersion
+
     # Get the Json directory from file; thanks to @rektrex for this function
     def readJsonDir(self):
         self.configfile = os.path.join(
@@ -144,48 +332,181 @@ class JsonLoader():
 
         return directory
 
-    # Loads game's JSON into memory
+    # Finds every JSON file under the JSON directory
     def getJsonFiles(self):
         print(f"Retrieving a list of JSON files from {self.jsonDir}...")
 
-        # Gets the name of each JSON file
-        # os.path.join does *not* work here
         jsonFiles = []
-        wildcard = self.jsonDir + "/**/*.json"
+        directories = [self.jsonDir]
+        # Real paths of every directory queued so far. Mod data paths may
+        # point anywhere (the core mod uses "../json/"), so each directory is
+        # only scanned the first time it is reached
+        visited = set()
 
-        for jsonFile in glob.iglob(wildcard, recursive=True):
-            jsonFiles.append(jsonFile)
+        # Walks the tree one level at a time, scanning all directories of a
+        # level in parallel
+        with ThreadPoolExecutor(max_workers=self.scanWorkers) as executor:
+            while directories:
+                directories = self.skipVisited(directories, visited)
+                subdirectories = []
+                for files, found in executor.map(self.scanDirectory, directories):
+                    jsonFiles += files
+                    subdirectories += found
+                directories = subdirectories
 
+        # Sorting keeps load order stable, so the same entry always wins
+        # when several files define it (data/json is loaded before data/mods)
+        jsonFiles.sort(key=lambda jsonFile: jsonFile.path)
         return jsonFiles
 
-    def createItemsDict(self):
-        self.items = {}
-        self.itemsByID = {}
+    def skipVisited(self, directories, visited):
+        unvisited = []
+        for directory in directories:
+            realPath = os.path.realpath(directory)
+            if realPath not in visited:
+                visited.add(realPath)
+                unvisited.append(directory)
+        return unvisited
+
+    # Returns the JSON files in directory and the subdirectories to scan next
+    def scanDirectory(self, directory):
+        jsonFiles = []
+        subdirectories = []
+
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            print(f"Failed to read {directory}. Skipping it.")
+            return jsonFiles, subdirectories
+
+        # Mods may keep their data in a subfolder named in modinfo.json
+        if any(entry.name == "modinfo.json" for entry in entries):
+            modDirectories = self.getModDirectories(directory)
+            if modDirectories != [os.path.normpath(directory)]:
+                return jsonFiles, modDirectories
+
+        for entry in entries:
+            # Hidden files and folders are skipped, same as glob does
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                if entry.name not in self.ignoredDirectories:
+                    subdirectories.append(entry.path)
+            elif entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                jsonFiles.append(JsonFile(entry.path, stat.st_mtime_ns, stat.st_size))
+
+        return jsonFiles, subdirectories
+
+    # Reads modinfo.json and returns the directories holding the mod's data
+    def getModDirectories(self, modDirectory):
+        modDirectory = os.path.normpath(modDirectory)
+        try:
+            with open(os.path.join(modDirectory, "modinfo.json"), "r", encoding="utf8") as modinfoFile:
+                modinfo = self.loadJsonFile(modinfoFile)
+        except (OSError, UnicodeDecodeError):
+            print(f"Failed to read modinfo.json in {modDirectory}. Scanning the whole folder.")
+            return [modDirectory]
+
+        if isinstance(modinfo, dict):
+            modinfo = [modinfo]
+        if not isinstance(modinfo, list):
+            return [modDirectory]
+
+        directories = []
+        for obj in modinfo:
+            if not isinstance(obj, dict) or obj.get("type") != "MOD_INFO":
+                continue
+            # Obsolete mods can no longer be loaded by the game
+            if obj.get("obsolete"):
+                return []
+            path = obj.get("path")
+            if isinstance(path, str):
+                dataDirectory = os.path.normpath(os.path.join(modDirectory, path))
+                if os.path.isdir(dataDirectory):
+                    directories.append(dataDirectory)
 
-        # We have to pre-populate self.items with empty keys so that
-        # handleObjectJson() works correctly
-        for t in self.types.keys():
-            self.items[t] = []
-            self.itemsByID[t] = {}
+        return directories or [modDirectory]
 
     def loadJson(self, jsonFiles):
         print("Loading items from JSON...")
         self.loadTypes()
-        self.createItemsDict()
+        store = JsonMemoryStore(self.types)
 
+        for objType, obj, objID in self.readObjects(jsonFiles):
+            store.add(objType, obj, objID)
+
+        # Both backends serve lists of entries and lookups by id alike
+        self.items = store
+        self.itemsByID = store
+        self.dataVersion += 1
+
+        self.processJson()
+
+    # Loads JSON into a SQLite database, which is reused between runs
+    # for as long as the JSON files stay unchanged
+    def loadDatabase(self, jsonFiles):
+        self.loadTypes()
+        database = JsonDatabase(self.getDatabasePath(), self.types)
+        signature = self.getFilesSignature(jsonFiles)
+
+        if database.getSignature() == signature:
+            print("JSON is unchanged, reusing the database...")
+        else:
+            print("Compiling JSON into the database...")
+            database.compile(self.readObjects(jsonFiles), signature)
+
+        self.items = database
+        self.itemsByID = database
+        self.dataVersion += 1
+
+        self.processJson()
+
+    # Load time passes that later views rely on
+    def processJson(self):
+        print("Parsing numeric columns...")
+        self.columns = JsonTabulator(self.items)
+
+        print("Resolving references...")
+        # The database already swept references when it was compiled
+        self.links = JsonLinker(self.items, self.itemsByID, self.items.getSavedLinks())
+        missing = self.links.countMissing()
+        if missing:
+            print(f"Found {missing} references to entries that do not exist.")
+            if self.reportMissing:
+                print(self.links.getMissingReport())
+            else:
+                print("Run with --report-missing to list them.")
+
+    def getDatabasePath(self):
+        return self.configfile + ".db"
+
+    # Any added, removed or modified file (or types.json) changes the signature
+    def getFilesSignature(self, jsonFiles):
+        signature = hashlib.sha1(json.dumps(self.types, sort_keys=True).encode())
+        signature.update(f"schema {JsonDatabase.schemaVersion}\n".encode())
+        for jsonFile in jsonFiles:
+            signature.update(f"{jsonFile.path}|{jsonFile.mtime}|{jsonFile.size}\n".encode())
+        return signature.hexdigest()
+
+    # Yields (type, object, id) for every object the browser knows about
+    def readObjects(self, jsonFiles):
         for jsonFile in jsonFiles:
-            with open(jsonFile, "r", encoding="utf8") as openedJsonFile:
+            with open(jsonFile.path, "r", encoding="utf8") as openedJsonFile:
                 jsonContent = self.loadJsonFile(openedJsonFile)
                 # Although most files are arrays of objects, some are just
                 # one object. This needs to be handled with a type check
                 if isinstance(jsonContent, list):
                     for obj in jsonContent:
-                        self.handleObjectJson(obj)
+                        handledObj = self.handleObjectJson(obj)
+                        if handledObj:
+                            yield handledObj
 
     def loadJsonFile(self, openedJsonFile):
         try: #TODO Replace with if?
             jsonContent = json.load(openedJsonFile)
-        except json.decoder.JSONDecodeError:
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError):
             print("Failed to read JSON file. Skipping it.")
             return None
 
@@ -205,9 +526,8 @@ class JsonLoader():
             if objType:
                 namedObj = self.setObjName(obj)
                 objID = self.getObjectID(namedObj)
-                self.items[objType].append(namedObj)
-                if objID:
-                    self.itemsByID[objType][objID] = namedObj
+                return objType, namedObj, objID
+        return None
 
     # Turns type specified in JSON into type program can read
     def resolveType(self, jsonType):
@@ -239,6 +559,707 @@ class JsonLoader():
                 obj["name"] = name.get("str_sp").lower()
         return obj
 
+# Matches a single "<amount> <unit>" pair, such as "500 g" or "1.5 L"
+unitPattern = re.compile(r"(-?\d+(?:\.\d+)?)\s*([a-z]+)")
+
+# Every value is converted to the smallest unit of its kind
+weightUnits = {"mg": 0.001, "g": 1, "kg": 1000}
+volumeUnits = {"ml": 1, "l": 1000}
+priceUnits = {"cent": 1, "usd": 100, "kusd": 100000}
+
+# Parses unit strings like "1 kg 500 g" into a single number
+# Plain numbers are multiplied by legacyUnit, since that is what older JSON used
+def parseUnits(value, units, legacyUnit=1):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value * legacyUnit
+    if not isinstance(value, str):
+        return None
+
+    matches = unitPattern.findall(value.lower())
+    if not matches:
+        return None
+
+    total = 0
+    for amount, unit in matches:
+        if unit not in units:
+            return None
+        total += float(amount) * units[unit]
+    return total
+
+def parseNumber(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+# Monsters have both the legacy "armor_bash" and the newer "armor": {"bash": x}
+def parseMonsterArmor(entry, damageType):
+    armor = entry.get("armor")
+    if isinstance(armor, dict):
+        return parseNumber(armor.get(damageType))
+    return parseNumber(entry.get("armor_" + damageType))
+
+# Reference extractors used by JsonLinker. Each one takes an attribute value
+# and returns the (type, id) pairs it refers to
+
+def getReferences(jsonType):
+    def extract(value):
+        if isinstance(value, str):
+            return [(jsonType, value)]
+        if isinstance(value, list):
+            return [(jsonType, v) for v in value if isinstance(v, str)]
+        return []
+    return extract
+
+# Lists like [["id", level], ...], or a dict keyed by id
+def getFirstOfEach(jsonType):
+    def extract(value):
+        if isinstance(value, dict):
+            return [(jsonType, key) for key in value]
+        if not isinstance(value, list):
+            return []
+        # skills_required may also be a single ["id", level] pair
+        if len(value) == 2 and isinstance(value[0], str):
+            return [(jsonType, value[0])]
+        return [(jsonType, v[0]) for v in value if isinstance(v, list) and v and isinstance(v[0], str)]
+    return extract
+
+# Lists of dicts that keep the id under key, like [{"part": "torso"}, ...]
+def getFromDicts(jsonType, key):
+    def extract(value):
+        if not isinstance(value, list):
+            return []
+        return [(jsonType, v[key]) for v in value if isinstance(v, dict) and isinstance(v.get(key), str)]
+    return extract
+
+# Tools and components: groups of alternatives like [[["id", 1], ["id2", 1]], ...]
+# An alternative with an extra element such as "LIST" is a requirement
+def getOptionType(option, jsonType):
+    return "requirement" if len(option) > 2 else jsonType
+
+def getAlternatives(jsonType):
+    def extract(value):
+        references = []
+        if not isinstance(value, list):
+            return references
+        for group in value:
+            if not isinstance(group, list):
+                continue
+            for option in group:
+                if isinstance(option, list) and option and isinstance(option[0], str):
+                    references.append((getOptionType(option, jsonType), option[0]))
+        return references
+    return extract
+
+# Sums up the "amount" of every damage unit in a monster's melee_damage
+def parseMeleeDamage(entry):
+    damage = entry.get("melee_damage")
+    if not isinstance(damage, list):
+        return parseNumber(entry.get("melee_cut"))
+
+    amounts = [parseNumber(unit.get("amount")) for unit in damage if isinstance(unit, dict)]
+    amounts = [amount for amount in amounts if amount is not None]
+    return sum(amounts) if amounts else None
+
+class JsonTabulator():
+    # Column name -> function that extracts a number from an entry
+    columnParsers = {
+        "item": {
+            "weight (g)": lambda e: parseUnits(e.get("weight"), weightUnits),
+            "volume (ml)": lambda e: parseUnits(e.get("volume"), volumeUnits, 250),
+            "price (cents)": lambda e: parseUnits(e.get("price"), priceUnits),
+            "postapoc price (cents)": lambda e: parseUnits(e.get("price_postapoc"), priceUnits),
+            "to_hit": lambda e: parseNumber(e.get("to_hit")),
+            "bashing": lambda e: parseNumber(e.get("bashing")),
+            "cutting": lambda e: parseNumber(e.get("cutting")),
+            "coverage": lambda e: parseNumber(e.get("coverage")),
+            "encumbrance": lambda e: parseNumber(e.get("encumbrance")),
+            "material_thickness": lambda e: parseNumber(e.get("material_thickness")),
+            "environmental_protection": lambda e: parseNumber(e.get("environmental_protection"))
+        },
+        "monster": {
+            "hp": lambda e: parseNumber(e.get("hp")),
+            "speed": lambda e: parseNumber(e.get("speed")),
+            "armor_bash": lambda e: parseMonsterArmor(e, "bash"),
+            "armor_cut": lambda e: parseMonsterArmor(e, "cut"),
+            "melee_skill": lambda e: parseNumber(e.get("melee_skill")),
+            "melee_dice": lambda e: parseNumber(e.get("melee_dice")),
+            "melee_dice_sides": lambda e: parseNumber(e.get("melee_dice_sides")),
+            "melee_damage": parseMeleeDamage,
+            "dodge": lambda e: parseNumber(e.get("dodge")),
+            "difficulty": lambda e: parseNumber(e.get("diff"))
+        }
+    }
+
+    def __init__(self, rawJson):
+        self.names = {}
+        self.columns = {}
+        self.tabulate(rawJson)
+
+    # Parses every entry once, so tables never have to walk the dicts again.
+    # Each column is a list indexed by the entry's position in rawJson[type];
+    # values that are missing or could not be parsed are None
+    def tabulate(self, rawJson):
+        for jsonType, parsers in self.columnParsers.items():
+            names = []
+            columns = {column: [] for column in parsers}
+
+            # The database backend parses these when it is compiled
+            for name, *values in rawJson.getParsedRows(jsonType):
+                names.append(name)
+                for column, value in zip(parsers, values):
+                    columns[column].append(value)
+
+            self.names[jsonType] = names
+            self.columns[jsonType] = columns
+
+    # Returns the entry's display name followed by its value for every column
+    @classmethod
+    def parseEntry(cls, jsonType, entry):
+        name = entry.get("name") or cls.getFallbackName(entry)
+        return [name] + [parser(entry) for parser in cls.columnParsers[jsonType].values()]
+
+    @staticmethod
+    def getFallbackName(entry):
+        return str(entry.get("id") or entry.get("abstract") or "")
+
+    def getTypes(self):
+        return list(self.columns.keys())
+
+    def getColumnNames(self, jsonType):
+        return list(self.columns[jsonType].keys())
+
+    def getColumn(self, jsonType, column):
+        return self.columns[jsonType][column]
+
+    def getNames(self, jsonType):
+        return self.names[jsonType]
+
+    def getAllIndices(self, jsonType):
+        return list(range(len(self.names[jsonType])))
+
+    # Returns entry indices ordered by column; missing values always go last
+    def sortIndices(self, jsonType, column, indices=None, reverse=False):
+        values = self.getColumn(jsonType, column)
+        if indices is None:
+            indices = self.getAllIndices(jsonType)
+
+        present = [i for i in indices if values[i] is not None]
+        missing = [i for i in indices if values[i] is None]
+        present.sort(key=values.__getitem__, reverse=reverse)
+
+        return present + missing
+
+    # Returns indices of entries whose value lies within [minimum, maximum]
+    # Either bound can be None to leave that side open
+    def filterRange(self, jsonType, column, minimum=None, maximum=None, indices=None):
+        values = self.getColumn(jsonType, column)
+        if indices is None:
+            indices = self.getAllIndices(jsonType)
+
+        result = []
+        for i in indices:
+            value = values[i]
+            if value is None:
+                continue
+            if minimum is not None and value < minimum:
+                continue
+            if maximum is not None and value > maximum:
+                continue
+            result.append(i)
+        return result
+
+    def aggregate(self, jsonType, column, indices=None):
+        values = self.getColumn(jsonType, column)
+        if indices is None:
+            indices = self.getAllIndices(jsonType)
+
+        present = [values[i] for i in indices if values[i] is not None]
+        if not present:
+            return {"count": 0, "min": None, "max": None, "mean": None}
+
+        return {
+            "count": len(present),
+            "min": min(present),
+            "max": max(present),
+            "mean": sum(present) / len(present)
+        }
+
+# Resolves every cross-reference the prettifiers show into id -> name tables
+# in one pass at load time, and collects references that point nowhere
+class JsonLinker():
+    # Type of the referring entry -> attribute -> reference extractor
+    referenceExtractors = {
+        "mutation": {
+            "category": getReferences("mutation_category"),
+            "prereqs": getReferences("mutation"),
+            "prereqs2": getReferences("mutation"),
+            "cancels": getReferences("mutation"),
+            "leads_to": getReferences("mutation"),
+            "threshreq": getReferences("mutation"),
+            "changes_to": getReferences("mutation"),
+            "wet_protection": getFromDicts("body_part", "part"),
+            "initial_ma_styles": getReferences("martial_art")
+        },
+        "recipe": {
+            "book_learn": getFirstOfEach("item"),
+            "components": getAlternatives("item"),
+            "tools": getAlternatives("item"),
+            "qualities": getFromDicts("tool_quality", "id"),
+            "skill_used": getReferences("skill"),
+            "skills_required": getFirstOfEach("skill"),
+            "using": getFirstOfEach("requirement")
+        },
+        "requirement": {
+            "components": getAlternatives("item"),
+            "tools": getAlternatives("item"),
+            "qualities": getFromDicts("tool_quality", "id")
+        }
+    }
+
+    linkedTypes = ("mutation_category", "mutation", "body_part", "martial_art", "item", "skill", "tool_quality", "requirement")
+
+    # saved can hold the "missing" report and resolved "requirements" of an
+    # earlier pass, which are then used instead of sweeping again
+    def __init__(self, rawJson, organizedJson, saved=None):
+        self.names = {}
+        # Referenced type -> missing id -> ids of the entries referring to it
+        self.missing = {}
+        # Requirement id -> its tools, components and qualities, with nested
+        # requirement lists already expanded
+        self.requirements = {}
+
+        for jsonType in self.linkedTypes:
+            self.names[jsonType] = organizedJson[jsonType].getNameTable()
+
+        if saved is not None:
+            self.missing = saved["missing"]
+            self.requirements = saved["requirements"]
+            return
+
+        for jsonType, extractors in self.referenceExtractors.items():
+            for entry in rawJson.get(jsonType, []):
+                self.checkReferences(entry, extractors)
+        self.resolveRequirements(rawJson)
+
+    def resolveRequirements(self, rawJson):
+        entries = {}
+        for entry in rawJson.get("requirement", []):
+            if entry.get("id"):
+                entries[entry["id"]] = entry
+
+        for requirementID in entries:
+            self.resolveRequirement(requirementID, entries, set())
+
+    # visiting guards against requirements that end up including themselves
+    def resolveRequirement(self, requirementID, entries, visiting):
+        if requirementID in self.requirements:
+            return self.requirements[requirementID]
+        entry = entries.get(requirementID)
+        if not entry or requirementID in visiting:
+            return None
+
+        visiting.add(requirementID)
+        resolve = lambda nestedID: self.resolveRequirement(nestedID, entries, visiting)
+        resolved = {
+            "tools": self.expandAlternatives(entry.get("tools"), "tools", resolve=resolve),
+            "components": self.expandAlternatives(entry.get("components"), "components", resolve=resolve),
+            "qualities": [q for q in entry.get("qualities") or [] if isinstance(q, dict)]
+        }
+        visiting.discard(requirementID)
+
+        self.requirements[requirementID] = resolved
+        return resolved
+
+    def getRequirement(self, requirementID):
+        return self.requirements.get(requirementID)
+
+    # Returns a copy of groups of alternatives with every amount multiplied by
+    # quantity, and each nested requirement list replaced by the alternatives
+    # it stands for. Nested lists that cannot be resolved are kept as they are
+    def expandAlternatives(self, groups, attribute, quantity=1, resolve=None):
+        resolve = resolve or self.getRequirement
+        output = []
+        if not isinstance(groups, list):
+            return output
+
+        for group in groups:
+            if not isinstance(group, list):
+                continue
+            expanded = []
+            for option in group:
+                if not isinstance(option, list) or len(option) < 2:
+                    continue
+                nested = resolve(option[0]) if getOptionType(option, "item") == "requirement" else None
+                if nested:
+                    nestedQuantity = option[1] if isinstance(option[1], (int, float)) else 1
+                    for nestedGroup in nested[attribute]:
+                        for nestedOption in nestedGroup:
+                            expanded.append(self.multiplyOption(nestedOption, nestedQuantity * quantity))
+                else:
+                    expanded.append(self.multiplyOption(option, quantity))
+            output.append(expanded)
+        return output
+
+    def multiplyOption(self, option, quantity):
+        if quantity == 1 or not isinstance(option[1], (int, float)):
+            return list(option)
+        return [option[0], option[1] * quantity] + option[2:]
+
+    def checkReferences(self, entry, extractors):
+        source = entry.get("id") or entry.get("result") or "?"
+        for attribute, extract in extractors.items():
+            for referencedType, referencedID in extract(entry.get(attribute)):
+                if referencedID not in self.names[referencedType]:
+                    self.addMissing(referencedType, referencedID, source)
+
+    def addMissing(self, jsonType, entryID, source):
+        sources = self.missing.setdefault(jsonType, {}).setdefault(entryID, [])
+        if source not in sources:
+            sources.append(source)
+
+    # Returns the display name for an id, or the id itself if it has none
+    def getName(self, entryID, jsonType):
+        table = self.names[jsonType]
+        if entryID not in table:
+            # Normally already caught by the link pass; kept for anything it missed
+            if entryID not in self.missing.get(jsonType, {}):
+                self.addMissing(jsonType, entryID, "view")
+            return entryID
+        return table[entryID] or entryID
+
+    def countMissing(self):
+        return sum(len(ids) for ids in self.missing.values())
+
+    def getMissingReport(self):
+        lines = []
+        for jsonType, ids in sorted(self.missing.items()):
+            for entryID, sources in sorted(ids.items()):
+                lines.append(f"{jsonType} {entryID} (referenced by {', '.join(sources)})")
+        return "\n".join(lines)
+
+def containsAllWords(entry, words):
+    description = entry.get("description")
+    if isinstance(description, dict):
+        description = description.get("str")
+    text = str(entry.get("name", "")) + " " + str(description or "").lower()
+    return all(word in text for word in words)
+
+# Keeps loaded JSON in memory. Has the same interface as JsonDatabase, so
+# nothing else has to know which one is in use
+class JsonMemoryStore():
+    def __init__(self, types):
+        self.categories = {jsonType: JsonMemoryCategory() for jsonType in types}
+
+    def add(self, objType, obj, objID):
+        self.categories[objType].add(obj, objID)
+
+    def __getitem__(self, jsonType):
+        return self.categories[jsonType]
+
+    def get(self, jsonType, default=None):
+        return self.categories.get(jsonType, default)
+
+    def keys(self):
+        return self.categories.keys()
+
+    def getParsedRows(self, jsonType):
+        return (JsonTabulator.parseEntry(jsonType, entry) for entry in self[jsonType])
+
+    # Nothing is saved between runs, so links are always resolved afresh
+    def getSavedLinks(self):
+        return None
+
+class JsonMemoryCategory():
+    def __init__(self):
+        self.entries = []
+        self.entriesByID = {}
+
+    def add(self, obj, objID):
+        self.entries.append(obj)
+        if objID:
+            self.entriesByID[objID] = obj
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, entryID):
+        return entryID in self.entriesByID
+
+    def get(self, entryID, default=None):
+        return self.entriesByID.get(entryID, default)
+
+    def getNameTable(self):
+        return {entryID: entry.get("name") for entryID, entry in self.entriesByID.items()}
+
+    # There is no index to use, so exact matches are left to the normal scan
+    def canFindExact(self, attributes):
+        return False
+
+    def findExact(self, attributes):
+        return None
+
+    def searchText(self, words):
+        return [entry for entry in self.entries if containsAllWords(entry, words)]
+
+# Stores loaded JSON in SQLite, one table per category, and fetches entries
+# on demand. Indexing it by category gives a JsonCategory, which behaves like
+# both the list in JsonLoader.items and the dict in JsonLoader.itemsByID
+class JsonDatabase():
+    # Changing what compile() stores must bump this, so old databases get rebuilt
+    schemaVersion = 4
+
+    # Columns that get their own index
+    indexedAttributes = ("id", "name", "type")
+    # Columns that hold the attribute exactly as it is in the JSON. id does
+    # not qualify, since skills keep theirs in "ident"
+    exactAttributes = ("name", "type")
+
+    def __init__(self, path, types, cacheSize=256):
+        self.types = types
+        # Gui loads in a background thread and then reads from the main
+        # one; the two never use the connection at the same time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # Small cache of recently fetched entries, keyed by (type, id)
+        self.cache = ResultCache(maxEntries=cacheSize, maxBytes=None)
+
+    def __getitem__(self, jsonType):
+        if jsonType not in self.types:
+            raise KeyError(jsonType)
+        return JsonCategory(self, jsonType)
+
+    def get(self, jsonType, default=None):
+        if jsonType not in self.types:
+            return default
+        return JsonCategory(self, jsonType)
+
+    def keys(self):
+        return self.types.keys()
+
+    def getParsedRows(self, jsonType):
+        return self[jsonType].getParsedRows()
+
+    # Returns the missing reference report saved by compile()
+    def getMissingReferences(self):
+        missing = {}
+        for jsonType, entryID, source in self.connection.execute(
+            "SELECT type, id, source FROM missing_references ORDER BY rowid"
+        ):
+            missing.setdefault(jsonType, {}).setdefault(entryID, []).append(source)
+        return missing
+
+    def getSignature(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        return row[0] if row else None
+
+    # Rebuilds every table from (type, object, id) tuples
+    def compile(self, objects, signature):
+        self.cache.clear()
+        with self.connection:
+            self.createTables()
+            textSearch = self.createTextSearch()
+
+            for objType, obj, objID in objects:
+                name = obj.get("name")
+                cursor = self.connection.execute(
+                    f'INSERT INTO "{objType}" (id, name, type, json) VALUES (?, ?, ?, ?)',
+                    (objID, name if isinstance(name, str) else None, obj.get("type"), json.dumps(obj))
+                )
+                if textSearch:
+                    self.connection.execute(
+                        "INSERT INTO text_search (category, position, name, description) VALUES (?, ?, ?, ?)",
+                        (objType, cursor.lastrowid, self.getText(obj, "name"), self.getText(obj, "description"))
+                    )
+                if objType in JsonTabulator.columnParsers:
+                    row = JsonTabulator.parseEntry(objType, obj)
+                    self.connection.execute(
+                        f'INSERT INTO "{objType}_columns" VALUES (?, {", ".join("?" * len(row))})',
+                        [cursor.lastrowid] + row
+                    )
+
+            linker = JsonLinker(self, self)
+            self.saveMissingReferences(linker.missing)
+            self.saveRequirements(linker.requirements)
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (signature,))
+
+    def saveRequirements(self, requirements):
+        self.connection.executemany(
+            "INSERT INTO resolved_requirements VALUES (?, ?)",
+            [(requirementID, json.dumps(resolved)) for requirementID, resolved in requirements.items()]
+        )
+
+    def getRequirement(self, requirementID):
+        row = self.connection.execute(
+            "SELECT json FROM resolved_requirements WHERE id = ?", (requirementID,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # What JsonLinker needs to skip its sweep
+    def getSavedLinks(self):
+        return {"missing": self.getMissingReferences(), "requirements": JsonResolvedRequirements(self)}
+
+    def saveMissingReferences(self, missing):
+        for jsonType, ids in missing.items():
+            for entryID, sources in ids.items():
+                self.connection.executemany(
+                    "INSERT INTO missing_references VALUES (?, ?, ?)",
+                    [(jsonType, entryID, source) for source in sources]
+                )
+
+    def createTables(self):
+        for jsonType in self.types:
+            self.connection.execute(f'DROP TABLE IF EXISTS "{jsonType}"')
+            # position keeps entries in the same order the JSON files were read
+            self.connection.execute(
+                f'CREATE TABLE "{jsonType}" (position INTEGER PRIMARY KEY, id TEXT, name TEXT, type TEXT, json TEXT)'
+            )
+            for attribute in self.indexedAttributes:
+                self.connection.execute(
+                    f'CREATE INDEX "{jsonType}_{attribute}" ON "{jsonType}" ({attribute}, position)'
+                )
+
+        # Numeric columns for the comparison tables, parsed once at compile time
+        for jsonType, parsers in JsonTabulator.columnParsers.items():
+            columns = ", ".join(f'"{column}" REAL' for column in parsers)
+            self.connection.execute(f'DROP TABLE IF EXISTS "{jsonType}_columns"')
+            self.connection.execute(
+                f'CREATE TABLE "{jsonType}_columns" (position INTEGER PRIMARY KEY, name TEXT, {columns})'
+            )
+
+        self.connection.execute("DROP TABLE IF EXISTS missing_references")
+        self.connection.execute("CREATE TABLE missing_references (type TEXT, id TEXT, source TEXT)")
+
+        self.connection.execute("DROP TABLE IF EXISTS resolved_requirements")
+        self.connection.execute("CREATE TABLE resolved_requirements (id TEXT PRIMARY KEY, json TEXT)")
+
+    # Returns False if this SQLite was built without FTS5
+    def createTextSearch(self):
+        self.connection.execute("DROP TABLE IF EXISTS text_search")
+        try:
+            self.connection.execute(
+                "CREATE VIRTUAL TABLE text_search USING fts5(category UNINDEXED, position UNINDEXED, name, description)"
+            )
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def hasTextSearch(self):
+        row = self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'text_search'").fetchone()
+        return row is not None
+
+    def getText(self, obj, attribute):
+        text = obj.get(attribute)
+        if isinstance(text, dict):
+            text = text.get("str") or text.get("str_sp")
+        return text if isinstance(text, str) else ""
+
+class JsonCategory():
+    def __init__(self, database, jsonType):
+        self.database = database
+        self.jsonType = jsonType
+
+    def execute(self, query, parameters=()):
+        return self.database.connection.execute(query.format(table=f'"{self.jsonType}"'), parameters)
+
+    # Entries are decoded one at a time while iterating
+    def __iter__(self):
+        for (text,) in self.execute("SELECT json FROM {table} ORDER BY position"):
+            yield json.loads(text)
+
+    def __len__(self):
+        return self.execute("SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def __contains__(self, entryID):
+        return self.get(entryID) is not None
+
+    def get(self, entryID, default=None):
+        key = (self.jsonType, entryID)
+        found, entry = self.database.cache.get(key)
+        if found:
+            return entry
+
+        # Later definitions override earlier ones, same as in JsonLoader.itemsByID
+        row = self.execute("SELECT json FROM {table} WHERE id = ? ORDER BY position DESC LIMIT 1", (entryID,)).fetchone()
+        if not row:
+            return default
+
+        entry = json.loads(row[0])
+        self.database.cache.put(key, entry)
+        return entry
+
+    def getNameTable(self):
+        return JsonNameTable(self)
+
+    # Yields the rows JsonTabulator.parseEntry made when the database was compiled
+    def getParsedRows(self):
+        columns = ", ".join(f'"{column}"' for column in JsonTabulator.columnParsers[self.jsonType])
+        table = f'"{self.jsonType}_columns"'
+        yield from self.database.connection.execute(f"SELECT name, {columns} FROM {table} ORDER BY position")
+
+    def canFindExact(self, attributes):
+        return all(attribute in self.database.exactAttributes for attribute in attributes)
+
+    # Returns the first entry whose attributes are all exactly equal, or None
+    def findExact(self, attributes):
+        conditions = " AND ".join(f"{attribute} = ?" for attribute in attributes)
+        row = self.execute(
+            "SELECT json FROM {table} WHERE " + conditions + " ORDER BY position LIMIT 1",
+            tuple(attributes.values())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Full text search over names and descriptions for entries containing
+    # every word, best matches first
+    def searchText(self, words):
+        if not self.database.hasTextSearch():
+            return [entry for entry in self if containsAllWords(entry, words)]
+
+        # Quoting each word stops FTS from treating user input as query syntax
+        ftsQuery = " ".join('"' + word.replace('"', '""') + '"' for word in words)
+        rows = self.execute(
+            "SELECT t.json FROM text_search s JOIN {table} t ON t.position = s.position "
+            "WHERE s.category = ? AND text_search MATCH ? ORDER BY rank",
+            (self.jsonType, ftsQuery)
+        )
+        return [json.loads(text) for (text,) in rows]
+
+# Read only id -> name mapping backed by a category's id index, so name
+# lookups do not need every name in memory
+class JsonNameTable():
+    def __init__(self, category):
+        self.category = category
+
+    def getRow(self, entryID):
+        return self.category.execute(
+            "SELECT name FROM {table} WHERE id = ? ORDER BY position DESC LIMIT 1", (entryID,)
+        ).fetchone()
+
+    def __contains__(self, entryID):
+        return self.getRow(entryID) is not None
+
+    def __getitem__(self, entryID):
+        row = self.getRow(entryID)
+        if row is None:
+            raise KeyError(entryID)
+        return row[0]
+
+# Read only id -> resolved requirement mapping fetched from the database
+class JsonResolvedRequirements():
+    def __init__(self, database):
+        self.database = database
+
+    def get(self, requirementID, default=None):
+        resolved = self.database.getRequirement(requirementID)
+        return default if resolved is None else resolved
+
 class JsonTranslator():
     def __init__(self):
         with open("translation.json", "r") as translationFile:
@@ -1,7 +1,22 @@
+import argparse
 import gui
 
 def main():
-    window = gui.Gui()
+    parser = argparse.ArgumentParser(description="A browser for Cataclysm DDA JSON")
+    parser.add_argument(
+        "--sqlite",
+        action="store_true",
+        help="keep entries in a SQLite database instead of memory; useful for large mod packs"
+    )
+    parser.add_argument(
+        "--report-missing",
+        action="store_true",
+        help="list every reference to an entry that does not exist when loading"
+    )
+    args = parser.parse_args()
+
+    window = gui.Gui(useDatabase=args.sqlite, reportMissing=args.report_missing)
+    window.mainloop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,105 @@
+import copy
+import os
+import sys
+
+import pytest
+
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repoDir, "src"))
+
+pytest.importorskip("textdistance")
+import gui
+import jsonhandler
+
+def createStore():
+    store = jsonhandler.JsonMemoryStore(jsonhandler.JsonLinker.linkedTypes + ("recipe",))
+    entries = [
+        ("item", {"id": "rock", "name": "rock"}),
+        ("item", {"id": "hammer", "name": "hammer"}),
+        ("skill", {"ident": "fabrication", "name": "fabrication"}, "fabrication"),
+        ("tool_quality", {"id": "CUT", "name": "cutting"}),
+        ("mutation", {"id": "claws", "name": "claws", "category": ["BEAST", "GHOST"], "prereqs": ["nails"]}),
+        ("mutation", {"id": "nails", "name": "nails"}),
+        ("mutation_category", {"id": "BEAST", "name": "beast"}),
+        ("requirement", {"id": "req_a", "components": [[["rock", 2], ["req_gone", 1, "LIST"]]], "qualities": [{"id": "CUT", "level": 1}]}),
+        ("requirement", {"id": "req_b", "components": [[["req_a", 3, "LIST"]]], "tools": [[["hammer", -1]]]}),
+        ("requirement", {"id": "req_c", "components": [[["req_c", 1, "LIST"]]]}),
+        ("recipe", {
+            "result": "hammer",
+            "skill_used": "fabrication",
+            "difficulty": 2,
+            "components": [[["rock", 1], ["stick", 2]], [["req_a", 1, "LIST"]]],
+            "using": [["req_b", 2], ["req_missing", 1]]
+        })
+    ]
+    for jsonType, obj, *ident in entries:
+        store.add(jsonType, obj, ident[0] if ident else obj.get("id"))
+    return store
+
+@pytest.fixture
+def store():
+    return createStore()
+
+@pytest.fixture
+def linker(store):
+    return jsonhandler.JsonLinker(store, store)
+
+def test_nested_lists_are_expanded_and_multiplied(linker):
+    assert linker.getRequirement("req_b")["components"] == [[["rock", 6], ["req_gone", 3, "LIST"]]]
+    assert linker.getRequirement("req_b")["tools"] == [[["hammer", -1]]]
+    assert linker.expandAlternatives([[["req_b", 2, "LIST"]]], "components", 5) == [[["rock", 60], ["req_gone", 30, "LIST"]]]
+
+def test_requirement_including_itself_is_kept_unresolved(linker):
+    assert linker.getRequirement("req_c")["components"] == [[["req_c", 1, "LIST"]]]
+
+def test_missing_references_are_collected(linker):
+    assert linker.missing == {
+        "item": {"stick": ["hammer"]},
+        "mutation_category": {"GHOST": ["claws"]},
+        "requirement": {"req_gone": ["req_a"], "req_missing": ["hammer"]}
+    }
+    assert "requirement req_gone (referenced by req_a)" in linker.getMissingReport()
+
+def test_names_fall_back_to_ids(linker):
+    assert linker.getName("BEAST", "mutation_category") == "beast"
+    assert linker.getName("GHOST", "mutation_category") == "GHOST"
+    # Already reported by the link pass, so viewing it adds nothing
+    assert linker.missing["mutation_category"]["GHOST"] == ["claws"]
+
+def createFrame(Frame, linker):
+    # Prettifiers only need the linker, so the Tk part is never set up
+    frame = Frame.__new__(Frame)
+    frame.links = linker
+    return frame
+
+def test_crafting_prettifier_leaves_loaded_json_alone(store, linker):
+    recipe = next(iter(store["recipe"]))
+    before = copy.deepcopy(recipe)
+    frame = createFrame(gui.CraftingFrame, linker)
+
+    for _ in range(2):
+        bufferJson = dict(recipe)
+        frame.prettifyEntry(bufferJson)
+
+    assert recipe == before
+    assert bufferJson["components"].split("\n") == [
+        "1 of rock or 2 of stick",
+        "2 of rock or 1 of req_gone",
+        "12 of rock or 6 of req_gone"
+    ]
+    assert bufferJson["tools"] == "hammer (-1 charges)"
+    assert bufferJson["skill_used"] == "fabrication (level 2)"
+    # A requirement option is not reported as a missing item
+    assert "req_gone" not in linker.missing.get("item", {})
+
+def test_mutation_prettifier_survives_missing_references(store, linker):
+    mutation = store["mutation"].get("claws")
+    before = copy.deepcopy(mutation)
+    frame = createFrame(gui.MutationFrame, linker)
+
+    bufferJson = dict(mutation)
+    frame.prettifyEntry(bufferJson)
+
+    assert mutation == before
+    assert bufferJson["category"] == "beast\nGHOST"
+    assert bufferJson["prereqs"] == "nails"
@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repoDir, "src"))
+
+pytest.importorskip("textdistance")
+import jsonhandler
+
+# Stands in for JsonLoader; reload() swaps in new data like a real reload
+class StubLoader():
+    def __init__(self, rockWeight):
+        self.dataVersion = 0
+        self.reload(rockWeight)
+
+    def reload(self, rockWeight):
+        self.items = jsonhandler.JsonMemoryStore(["item"])
+        self.items.add("item", {"id": "rock", "name": "rock", "weight": rockWeight, "description": "a heavy stone"}, "rock")
+        self.items.add("item", {"id": "stick", "name": "stick", "description": "a long branch"}, "stick")
+        self.dataVersion += 1
+
+    def getOrganizedJson(self):
+        return self.items
+
+    def getDataVersion(self):
+        return self.dataVersion
+
+def createSearcher(loader):
+    return jsonhandler.JsonSearcher(loader.items, loader.getOrganizedJson(), loader)
+
+def test_cache_evicts_least_recently_used():
+    cache = jsonhandler.ResultCache(maxEntries=2)
+    cache.put("a", ["a"])
+    cache.put("b", ["b"])
+    # Using "a" makes "b" the oldest
+    assert cache.get("a") == (True, ["a"])
+    cache.put("c", ["c"])
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, ["a"])
+    assert cache.get("c") == (True, ["c"])
+    assert cache.getStats()["evictions"] == 1
+
+def test_cache_is_bounded_by_bytes():
+    cache = jsonhandler.ResultCache(maxEntries=100, maxBytes=1000)
+    for i in range(20):
+        cache.put(i, ["x" * 100])
+
+    stats = cache.getStats()
+    assert stats["bytes"] <= 1000
+    assert 0 < stats["entries"] < 20
+    # The newest results are the ones kept
+    assert cache.get(19)[0]
+    assert not cache.get(0)[0]
+
+def test_cache_skips_results_larger_than_its_bound():
+    cache = jsonhandler.ResultCache(maxEntries=100, maxBytes=100)
+    cache.put("big", ["x" * 1000])
+    assert cache.get("big") == (False, None)
+
+def test_cache_keeps_falsy_results():
+    cache = jsonhandler.ResultCache()
+    cache.put("empty", [])
+    assert cache.get("empty") == (True, [])
+
+def test_cache_is_emptied_when_version_changes():
+    cache = jsonhandler.ResultCache()
+    cache.checkVersion(1)
+    cache.put("a", ["a"])
+    cache.checkVersion(1)
+    assert cache.get("a")[0]
+
+    cache.checkVersion(2)
+    assert cache.get("a") == (False, None)
+    assert cache.getStats()["invalidations"] == 1
+
+def test_repeated_searches_hit_the_cache():
+    searcher = createSearcher(StubLoader("500 g"))
+    first = searcher.searchByAttribute({"name": "rok"}, "item")
+    searcher.searchByAttribute({"name": "rok"}, "item")
+    searcher.searchByText("heavy", "item")
+    # Case and extra spaces do not make it a different query
+    searcher.searchByText("  HEAVY ", "item")
+
+    assert first == ["rock"]
+    stats = searcher.getCacheStats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+def test_id_search_is_a_direct_lookup():
+    searcher = createSearcher(StubLoader("500 g"))
+    assert searcher.searchByAttribute({"id": "stick"}, "item")["name"] == "stick"
+    assert searcher.getEntryByID("rock", "item")["weight"] == "500 g"
+
+def test_empty_text_search_finds_nothing():
+    searcher = createSearcher(StubLoader("500 g"))
+    assert searcher.searchByText("   ", "item") == []
+
+def test_searcher_uses_new_data_after_reload():
+    loader = StubLoader("500 g")
+    searcher = createSearcher(loader)
+    assert searcher.searchByAttribute({"name": "rock"}, "item")["weight"] == "500 g"
+
+    loader.reload("900 g")
+    assert searcher.searchByAttribute({"name": "rock"}, "item")["weight"] == "900 g"
+    assert searcher.getEntryByID("rock", "item")["weight"] == "900 g"
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import tkinter as tk
+
+import pytest
+
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repoDir, "src"))
+
+pytest.importorskip("textdistance")
+import gui
+import jsonhandler
+
+# Budgets, in seconds. The window has to show up well before the (slow)
+# stub loader finishes, and a search has to come back quickly
+firstPaintBudget = 1.0
+firstSearchBudget = 0.5
+loadDelay = 2.0
+itemCount = 5000
+
+# Stands in for JsonLoader with generated items and a slow load
+class StubLoader():
+    def __init__(self, delay=loadDelay):
+        self.delay = delay
+        self.dataVersion = 0
+
+    def readJsonDir(self):
+        return repoDir
+
+    def getJson(self):
+        time.sleep(self.delay)
+        types = dict.fromkeys(["item", "monster", *jsonhandler.JsonLinker.linkedTypes])
+        self.items = jsonhandler.JsonMemoryStore(types)
+        for i in range(itemCount):
+            self.items.add("item", {"type": "GENERIC", "id": f"item_{i}", "name": f"item {i}"}, f"item_{i}")
+        self.itemsByID = self.items
+        self.columns = jsonhandler.JsonTabulator(self.items)
+        self.links = jsonhandler.JsonLinker(self.items, self.itemsByID)
+        self.dataVersion += 1
+        return self.items
+
+    def getOrganizedJson(self):
+        return self.itemsByID
+
+    def getColumns(self):
+        return self.columns
+
+    def getLinks(self):
+        return self.links
+
+    def getDataVersion(self):
+        return self.dataVersion
+
+class StubGui(gui.Gui):
+    def createLoader(self):
+        return StubLoader()
+
+# Stands in for the Tk frames; asks for the shared objects like LookupFrame does
+class StubFrame():
+    def __init__(self, parent, controller):
+        self.searcher = controller.getSearcher() if controller.dataLoaded else None
+        self.translator = controller.getTranslator() if controller.dataLoaded else None
+
+    def grid(self, **_):
+        pass
+
+    def tkraise(self):
+        pass
+
+    def setStatus(self, _):
+        pass
+
+# A Gui that has its state but no Tk window, so it works without a display
+def createHeadlessGui():
+    window = StubGui.__new__(StubGui)
+    window.createState(time.perf_counter(), False)
+    window.container = None
+    window.frameClasses = {name: StubFrame for name in window.frameClasses}
+    return window
+
+# Runs the Tk event loop until condition() is true or timeout runs out
+def pump(window, condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        window.update()
+        time.sleep(0.01)
+    return condition()
+
+@pytest.fixture
+def window(monkeypatch):
+    # JsonTranslator reads translation.json from the working directory
+    monkeypatch.chdir(repoDir)
+    try:
+        window = StubGui()
+    except tk.TclError:
+        pytest.skip("no display available")
+    yield window
+    window.destroy()
+
+def test_first_search_budget_without_display():
+    loader = StubLoader(delay=0)
+    items = loader.getJson()
+    searcher = jsonhandler.JsonSearcher(items, loader.getOrganizedJson(), loader)
+
+    startTime = time.perf_counter()
+    result = searcher.searchByAttribute({"name": "item 12x"}, "item")
+    assert time.perf_counter() - startTime < firstSearchBudget
+    assert result
+
+def test_frames_are_built_lazily_and_share_searcher(monkeypatch):
+    monkeypatch.chdir(repoDir)
+    window = createHeadlessGui()
+    assert window.frames == {}
+
+    window.showFrame("MainFrame")
+    assert list(window.frames) == ["MainFrame"]
+
+    # Lookup frames cannot be built before the JSON is there
+    window.showFrame("ItemFrame")
+    assert list(window.frames) == ["MainFrame"]
+
+    window.jsonLoader = StubLoader(delay=0)
+    window.jsonLoader.getJson()
+    window.useLoadedJson()
+    assert list(window.frames) == ["MainFrame"]
+
+    window.showFrame("ItemFrame")
+    window.showFrame("MonsterFrame")
+    assert sorted(window.frames) == ["ItemFrame", "MainFrame", "MonsterFrame"]
+
+    itemFrame = window.frames["ItemFrame"]
+    monsterFrame = window.frames["MonsterFrame"]
+    assert itemFrame.searcher is monsterFrame.searcher is window.searcher
+    assert itemFrame.translator is monsterFrame.translator is window.translator
+    assert window.searcher is not None and window.translator is not None
+
+def test_window_is_painted_before_loading_finishes(window):
+    # Only the main frame exists until another one is shown
+    assert list(window.frames) == ["MainFrame"]
+    assert pump(window, lambda: window.firstPaintTime is not None, 5)
+    assert window.firstPaintTime < firstPaintBudget
+    # The sidebar keeps handling events while the loader is still busy
+    assert not window.dataLoaded
+
+def test_first_search_is_fast(window):
+    assert pump(window, lambda: window.dataLoaded, loadDelay + 10)
+
+    window.showFrame("ItemFrame")
+    frame = window.frames["ItemFrame"]
+    frame.searchField.insert(0, "item 12x")
+    frame.runSearch()
+
+    assert window.firstSearchTime is not None
+    assert window.firstSearchTime < firstSearchBudget